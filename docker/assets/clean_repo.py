@@ -9,7 +9,15 @@ Clean Repo script
 import argparse
 import subprocess
 import os
-import yaml
+import shutil
+import tempfile
+from config_loader import load_config
+
+# RAM disk mount point (docker run --tmpfs /work:size=4g,exec)
+TMPFS_ROOT = "/work"
+REPORTS_DIR = "reports"
+# --paths-from-file line prefixes understood by git filter-repo
+FILTER_PREFIXES = ("literal:", "glob:", "regex:")
 
 
 class RepositoryCleaner:
@@ -19,20 +27,27 @@ class RepositoryCleaner:
         self.config_file = config_file
         self.repo_path = repo_path
         self.dry_run = dr
-        self.reports_path = f"{self.repo_path}/reports"
-        self.reports_file1 = "git-filter-branch.txt"
-        self.reports_file2 = "git-filter-repo.txt"
 
-        # Change execution location
-        os.chdir(self.repo_path)
-        self.pwd = os.getcwd()
+        self.reports_path = f"{self.repo_path}/{REPORTS_DIR}"
+        self.reports_file = "git-filter-repo.txt"
+        self.git_env = None
+
+        self.pwd = os.path.abspath(self.repo_path)
+
+        # Rewrite on a RAM disk copy of the repo (USE_TMPFS=1), only when
+        # the tmpfs is actually mounted and the history will be rewritten
+        self.tmpfs_path = None
+        if os.environ.get('USE_TMPFS') == '1' and not self.dry_run:
+            if os.path.ismount(TMPFS_ROOT):
+                self.tmpfs_path = os.path.join(TMPFS_ROOT, os.path.basename(self.pwd))  # noqa: E501
+            else:
+                print(f"{TMPFS_ROOT} is not mounted, working in place")
 
     def exec(self):
         """ main function """
 
         # Read config (yaml) file
-        with open(self.repo_path + "/"+self.config_file, 'r', encoding="utf-8") as file:  # noqa: E501
-            config = yaml.safe_load(file)
+        config = load_config(os.path.join(self.repo_path, self.config_file))
 
         # Grab parameters
         repo_local_name = config['repo_local_name']
@@ -54,99 +69,185 @@ class RepositoryCleaner:
         if not os.path.exists(self.reports_path):
             os.makedirs(self.reports_path)
 
-        # Execute filters
+        # Keep exclusions present in history only (cheap git log probe)
+        found = []
         for excl in exclusion_files:
-
-            # Execute git filter-branch
-            print('git filter-branch - Deleting from repo: '+excl)
-            if not self.dry_run:
-                self.filter_branch(excl)
+            if self.in_history(excl):
+                print('git filter-repo - Deleting from repo: '+excl)
+                found.append(excl)
             else:
-                print("dry-run")
+                print('git filter-repo - Not in history:     '+excl)
+
+        # Execute git filter-repo (single pass for all exclusions)
+        if not found:
+            print("nothing to exclude")
+        elif not self.dry_run:
+            # One path per line (literal match, glob if wildcards)
+            with tempfile.NamedTemporaryFile('w', suffix='.txt', encoding="utf-8", delete=False) as tmp:  # noqa: E501
+                tmp.write('\n'.join(self.filter_path(excl) for excl in found) + '\n')  # noqa: E501
+            try:
+                workdir = self.to_tmpfs() if self.tmpfs_path else self.pwd
+                self.filter_repo(tmp.name, workdir)
+                if workdir != self.pwd:
+                    self.sync_back(workdir)
+            finally:
+                os.remove(tmp.name)
+                if self.tmpfs_path:
+                    shutil.rmtree(self.tmpfs_path, ignore_errors=True)
+        else:
+            print("dry-run")
+
+    def to_tmpfs(self):
+        """
+        Copy the repo to the RAM disk, dropping leftovers of earlier runs
 
-            # Execute git filter-repo
-            print('git filter-repo - Deleting from repo: '+excl)
-            if not self.dry_run:
-                self.filter_repo(excl)
-            else:
-                print("dry-run")
+        Returns:
+            str: RAM disk copy path
+        """
+        print('Copying to:       '+self.tmpfs_path)
+        if os.path.lexists(self.tmpfs_path):
+            shutil.rmtree(self.tmpfs_path)
+        shutil.copytree(self.pwd, self.tmpfs_path, symlinks=True)
+        self.safe_directory(self.tmpfs_path)
+        return self.tmpfs_path
+
+    def sync_back(self, workdir):
+        """
+        Replace the checkout content with the rewritten RAM disk copy
+
+        The checkout directory itself is kept (mount point, shell cwd): the
+        copy is staged inside it first, then entries are swapped in and
+        the ones gone from the copy removed (rsync --delete like)
+
+        Args:
+            workdir (str): rewritten repo path
+        """
+        print('Copying back to:  '+self.pwd)
+        staged = os.path.join(self.pwd, f".clean-repo-staged-{os.getpid()}")
+        previous = os.path.join(self.pwd, f".clean-repo-orig-{os.getpid()}")
+        try:
+            shutil.copytree(workdir, staged, symlinks=True)
+        except OSError:
+            shutil.rmtree(staged, ignore_errors=True)
+            raise
+        # Same filesystem: renames only from here on
+        os.mkdir(previous)
+        for entry in os.listdir(self.pwd):
+            path = os.path.join(self.pwd, entry)
+            if path not in (staged, previous):
+                os.rename(path, os.path.join(previous, entry))
+        for entry in os.listdir(staged):
+            os.rename(os.path.join(staged, entry), os.path.join(self.pwd, entry))  # noqa: E501
+        os.rmdir(staged)
+        shutil.rmtree(previous)
 
     def safe_directory(self, repodir):
         """
-        Generate global safe repo (gitconfig file)
+        Mark repo as safe for the git processes spawned by this script
+        (GIT_CONFIG_* env vars, no extra `git config --global` process)
 
         Args:
             repodir (str): Repository path
         """
-        subprocess.Popen(['git', 'config',
-                          '--global', '--add',
-                          'safe.directory', repodir])
+        env = dict(self.git_env or os.environ)
+        idx = int(env.get('GIT_CONFIG_COUNT', 0))
+        env[f'GIT_CONFIG_KEY_{idx}'] = 'safe.directory'
+        env[f'GIT_CONFIG_VALUE_{idx}'] = repodir
+        env['GIT_CONFIG_COUNT'] = str(idx + 1)
+        self.git_env = env
 
-    def filter_branch(self, loc):
-        """Execute branch filtering
+    def filter_path(self, loc):
+        """Translate an exclusion into a filter-repo paths file entry
 
         Args:
-            loc (str): file location to remove from history
+            loc (str): file location (or wildcard pattern) to remove
 
         Returns:
-            obj: process response
+            str: paths file line
         """
-        # removes object at location from all commits and tags
-        subcommand = f"'git rm -rf --cached --ignore-unmatch {loc}'"
-        with open("{}/{}".format(self.reports_path, self.reports_file1), "a", encoding="utf-8") as fout:  # noqa: E501
-            # don't use pipe or it will deadlock when the buffer fills up
-            p = subprocess.Popen(' '.join(
-                [
-                    'git',
-                    'filter-branch',
-                    '-f',
-                    '--index-filter',
-                    subcommand,
-                    '--tag-name-filter',
-                    'cat', '--',
-                    '--all'
-                ]
-            ), stdout=fout, stderr=fout, shell=True)
-            # p = subprocess.Popen(' '.join(['git', 'filter-branch', '-f',
-            #                                '--index-filter', subcommand,
-            #                                'HEAD']),
-            #                      stdout=fout, stderr=fout, shell=True)
-
-            # git filter-branch --index-filter 'git rm -rf --cached --ignore-unmatch path_to_file' HEAD # noqa: E501
-        p.wait()
-        return p
-
-    def filter_repo(self, loc):
+        if loc.startswith(FILTER_PREFIXES):
+            return loc
+        if any(c in loc for c in "*?["):
+            return f"glob:{loc}"
+        return loc
+
+    def in_history(self, loc):
+        """Check whether a location ever existed in the repo history
+
+        Args:
+            loc (str): file location (or wildcard pattern)
+
+        Returns:
+            bool: True if found (or not checkable), False otherwise
+        """
+        entry = self.filter_path(loc)
+        if entry.startswith("regex:"):
+            return True
+        if entry.startswith("glob:"):
+            pathspec = entry[len("glob:"):]
+        else:
+            pathspec = ":(literal)" + entry.removeprefix("literal:")
+        # git log --all -1 -- <path>: stops on the first commit touching it
+        p = subprocess.run(['git', 'log', '--all', '--format=%H', '-1',
+                            '--', pathspec],
+                           capture_output=True, text=True,
+                           cwd=self.pwd, env=self.git_env, check=True)
+        return bool(p.stdout.strip())
+
+    def filter_repo(self, paths_file, workdir):
         """Execute repo filtering
 
         Args:
-            loc (str): file location to remove from history
+            paths_file (str): file listing locations to remove from history
+            workdir (str): repo to rewrite (checkout or RAM disk copy)
 
         Returns:
             obj: process response
         """
-        # removes object from all commits and tags using git filter-repo
-        with open("{}/{}".format(self.reports_path, self.reports_file2), "a", encoding="utf-8") as fout:  # noqa: E501
+        # removes objects from all commits and tags using git filter-repo
+        # in a single pass over the history
+        with open("{}/{}/{}".format(workdir, REPORTS_DIR, self.reports_file), "a", encoding="utf-8") as fout:  # noqa: E501
             # don't use pipe or it will deadlock when the buffer fills up
-            p = subprocess.Popen(' '.join(['git', 'filter-repo',
-                                           '--invert-paths',
-                                           '--force',
-                                           '--path', loc]),
-                                 stdout=fout, stderr=fout, shell=True)
-            # git filter-repo --invert-paths --path <path to the file or directory> # noqa: E501
-        p.wait()
-        return p
-
-
-if __name__ == '__main__':
+            # git filter-repo --invert-paths --paths-from-file <file listing paths> # noqa: E501
+            return subprocess.run(['git', 'filter-repo',
+                                   '--invert-paths',
+                                   '--force',
+                                   '--paths-from-file', paths_file],
+                                  stdout=fout, stderr=fout,
+                                  cwd=workdir, env=self.git_env, check=True)
+
+
+def _build_parser():
+    """
+    Build the command line parser
+
+    Returns:
+        object: argument parser
+    """
     parser = argparse.ArgumentParser()
 
     parser.add_argument('--config-file')
     parser.add_argument('--repo-path')
     parser.add_argument('--dry-run', action=argparse.BooleanOptionalAction)
+    return parser
+
+
+_PARSER = _build_parser()
+
 
-    args = parser.parse_args()
+def main(argv=None):
+    """
+    main entrypoint
+
+    Args:
+        argv (list): command line arguments (defaults to sys.argv)
+    """
+    args = _PARSER.parse_args(argv)
 
     repo_cleaner = RepositoryCleaner(
         config_file=args.config_file, repo_path=args.repo_path, dr=args.dry_run)  # noqa: E501
     repo_cleaner.exec()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared helpers for repo scripts
+"""
+
+import os
+
+
+def resolve_conf(var, key, config):
+    """
+    Facilitate config set up
+
+    Args:
+        var (str): input var
+        key (str): key in config
+        config (object): config key-values
+
+    Returns:
+        str: computed var to use
+    """
+    ret = var
+    if key in config:
+        ret = config[key]
+    return ret
+
+
+def resolve_env(var, key):
+    """
+    Function to facilitate env vars
+
+    Args:
+        var (str): input value
+        key (str): env key to check
+
+    Returns:
+        str: computed env var to use
+    """
+    ret = var
+    if var is None:
+        ret = os.environ[key]
+    return ret
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared config (yaml) loader
+"""
+
+# pylint: disable=line-too-long
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+import yaml
+try:
+    # libyaml backed parser, falls back to the pure python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+CACHE_MAX_SIZE = 16
+SIDECAR_DIR = os.path.join(tempfile.gettempdir(), "repo-ci")
+
+_cache = OrderedDict()
+
+
+def _file_signature(path):
+    """
+    Compute the invalidation signature of a file
+
+    Args:
+        path (str): absolute file path
+
+    Returns:
+        tuple: (mtime_ns, size, inode)
+    """
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _sidecar_path(path, signature):
+    """
+    Compute the json sidecar location for a given file state
+
+    Args:
+        path (str): absolute file path
+        signature (tuple): file signature
+
+    Returns:
+        str: sidecar path
+    """
+    sha = hashlib.sha1(f"{path}:{signature}".encode("utf-8")).hexdigest()
+    return os.path.join(SIDECAR_DIR, f"config.{sha}.json")
+
+
+def _read_sidecar(sidecar):
+    """
+    Read a json sidecar if present
+
+    Args:
+        sidecar (str): sidecar path
+
+    Returns:
+        object: parsed config, None if not available
+    """
+    try:
+        with open(sidecar, 'r', encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_sidecar(sidecar, config):
+    """
+    Persist parsed config as json so other processes skip yaml parsing
+
+    Args:
+        sidecar (str): sidecar path
+        config (object): parsed config
+    """
+    try:
+        text = json.dumps(config)
+        # json turns int keys into strings, dates are not serializable...:
+        # only persist configs that come back identical
+        if json.loads(text) != config:
+            return
+    except (TypeError, ValueError):
+        return
+
+    tmp = f"{sidecar}.{os.getpid()}"
+    try:
+        os.makedirs(SIDECAR_DIR, exist_ok=True)
+        with open(tmp, 'w', encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp, sidecar)
+    except OSError:
+        # Not writable: in-process cache only
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def load_config(path):
+    """
+    Load a yaml config file, reusing previous parsing when unchanged
+
+    Args:
+        path (str): config file path
+
+    Returns:
+        object: config key-values
+    """
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+
+    cached = _cache.get(path)
+    if cached is not None and cached[:3] == signature:
+        _cache.move_to_end(path)
+        return cached[3]
+
+    sidecar = _sidecar_path(path, signature)
+    config = _read_sidecar(sidecar)
+    if config is None:
+        # libyaml decodes utf-8 itself, skip the python text layer
+        with open(path, 'rb') as file:
+            config = yaml.load(file, Loader=SafeLoader)
+        _write_sidecar(sidecar, config)
+
+    _cache[path] = signature + (config,)
+    _cache.move_to_end(path)
+    if len(_cache) > CACHE_MAX_SIZE:
+        _cache.popitem(last=False)
+    return config
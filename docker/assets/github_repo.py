@@ -9,8 +9,36 @@ GitHub Repo creation
 import argparse
 import os
 import time
-import yaml
-from github import Github, Auth
+from concurrent.futures import ThreadPoolExecutor
+from github import Github, Auth, GithubException, UnknownObjectException
+from common import resolve_conf, resolve_env
+from config_loader import load_config
+
+PROTECTED_BRANCH = "main"
+BYPASS_USER = "jbordat-jb"
+
+# Org + repo + branch protection rule + bypass user in one round-trip
+GQL_LOOKUP = """
+query($org: String!, $repo: String!, $ref: String!, $user: String!) {
+  organization(login: $org) {
+    repository(name: $repo) {
+      id
+      ref(qualifiedName: $ref) { name branchProtectionRule { id pattern } }
+    }
+  }
+  user(login: $user) { id }
+}
+"""
+GQL_CREATE_RULE = """
+mutation($input: CreateBranchProtectionRuleInput!) {
+  createBranchProtectionRule(input: $input) { branchProtectionRule { id } }
+}
+"""
+GQL_UPDATE_RULE = """
+mutation($input: UpdateBranchProtectionRuleInput!) {
+  updateBranchProtectionRule(input: $input) { branchProtectionRule { id } }
+}
+"""
 
 
 class GitLab:
@@ -21,61 +49,24 @@ class GitLab:
         self.config_file = cfg_f
         self.repo_path = repo_path
         # Read config (yaml) file
-        with open(self.repo_path + "/"+self.config_file, 'r', encoding="utf-8") as file:  # noqa: E501
-            config = yaml.safe_load(file)
+        config = load_config(os.path.join(self.repo_path, self.config_file))
         # Dry run
         self.dry_run = dr
         self.repo_local_name = config['repo_local_name']
 
         # GitHub vars
-        gh_user = self.set_var_env(gh_user, 'GITHUB_USER')
-        gh_pass = self.set_var_env(gh_pass, 'GITHUB_PASS')
-        self.github_org_name = self.set_var_env(gh_org, 'GITHUB_ORG')
+        gh_user = resolve_env(gh_user, 'GITHUB_USER')
+        gh_pass = resolve_env(gh_pass, 'GITHUB_PASS')
+        self.github_org_name = resolve_env(gh_org, 'GITHUB_ORG')
         self.github_repo_name = config['github_repo_name']
-        self.github_repo_description = self.set_var_conf(
+        self.github_repo_description = resolve_conf(
             "", 'gitlab_sync_repo_desc', config)
-        self.gh_c_repo = self.set_var_conf(
+        self.gh_c_repo = resolve_conf(
             gh_c_repo, 'github_create_repo', config)
         # GH object using an access token
         auth = Auth.Token(gh_pass)
         self.gh = Github(auth=auth)
 
-        # Change execution location
-        os.chdir(self.repo_path)
-
-    def set_var_conf(self, var, key, config):
-        """
-        Facilitate config set up
-
-        Args:
-            var (str): input var
-            key (str): key in config
-            config (object): config key-values
-
-        Returns:
-            str: computed var to use
-        """
-        ret = var
-        if key in config:
-            ret = config[key]
-        return ret
-
-    def set_var_env(self, var, env):
-        """
-        Function to facilitate env vars
-
-        Args:
-            var (str): input value
-            env (str): env key to check
-
-        Returns:
-            str: computed env var to use
-        """
-        ret = var
-        if var is None:
-            ret = os.environ[env]
-        return ret
-
     def exec(self):
         """ main function """
 
@@ -90,11 +81,79 @@ class GitLab:
         print('')
         print('---------------------------------------------------')
 
+        try:
+            self.exec_graphql()
+        except GithubException as e:
+            print(f"\tGraphQL failed ({e.status}), falling back to REST")
+            self.exec_rest()
+
+        # TODO Ensure webhook
+
+        # To close connections after use
+        self.gh.close()
+
+    def exec_graphql(self):
+        """ repo + branch protection through GitHub GraphQL API """
+
         print('Repository:    '+self.repo_local_name)
-        # Get org
-        org = self.get_org(self.github_org_name)
         # Get repo (attempt)
-        repo = self.get_repo(org, self.github_repo_name)
+        print(f"\tGet repo {self.github_repo_name}")
+        repo, user_id = self.gql_lookup()
+        # If no repo found, create one
+        if (repo is None and self.gh_c_repo) and not self.dry_run:
+            self.create_repo(self.get_org(self.github_org_name))
+            time.sleep(10)
+            repo, user_id = self.gql_lookup()
+        else:
+            if self.dry_run:
+                print("\tRepo create skipped: dry-run")
+            if not self.gh_c_repo:
+                print("\tRepo create skipped: creation disabled")
+            if repo is not None:
+                print("\tRepo already exists")
+
+        # Ensure branch ruleset
+        print('Branch ruleset enforcement')
+        if repo is None or repo['ref'] is None:
+            print(f"\tBranch {PROTECTED_BRANCH} not found, skipped")
+            return
+        rule_input = {
+            'requiresStatusChecks': True,
+            'requiresStrictStatusChecks': True,
+            'requiresApprovingReviews': True,
+            'dismissesStaleReviews': True,
+            'requiresCodeOwnerReviews': True,
+            'requiredApprovingReviewCount': 1,
+            'allowsForcePushes': True,
+            'allowsDeletions': False,
+            'blocksCreations': False,
+            'bypassPullRequestActorIds': [user_id],
+            'restrictsPushes': True,
+            'pushActorIds': [user_id],
+        }
+        # The ref reports whichever rule applies, possibly a shared wildcard
+        # one (`*`, `release/*`...): only update a rule dedicated to the
+        # branch (exact names take precedence, so none exists otherwise)
+        rule = repo['ref']['branchProtectionRule']
+        if rule is None or rule['pattern'] != PROTECTED_BRANCH:
+            rule_input.update(
+                {'repositoryId': repo['id'], 'pattern': PROTECTED_BRANCH})
+            self.gql(GQL_CREATE_RULE, {'input': rule_input})
+        else:
+            rule_input['branchProtectionRuleId'] = rule['id']
+            self.gql(GQL_UPDATE_RULE, {'input': rule_input})
+
+    def exec_rest(self):
+        """ repo + branch protection through GitHub REST API """
+
+        print('Repository:    '+self.repo_local_name)
+        # Get org and repo (attempt) concurrently (independent calls)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            f_org = pool.submit(self.get_org, self.github_org_name)
+            f_repo = pool.submit(
+                self.get_repo, self.github_org_name, self.github_repo_name)
+            org = f_org.result()
+            repo = f_repo.result()
         # If no repo found, create one
         if (repo is None and self.gh_c_repo) and not self.dry_run:
             repo = self.create_repo(org)
@@ -109,7 +168,7 @@ class GitLab:
 
         # Ensure branch ruleset
         print('Branch ruleset enforcement')
-        b = repo.get_branch("main")
+        b = repo.get_branch(PROTECTED_BRANCH)
         b.edit_protection(
             strict=True,
             dismiss_stale_reviews=True,
@@ -118,14 +177,46 @@ class GitLab:
             allow_force_pushes=True,
             allow_deletions=False,
             block_creations=False,
-            users_bypass_pull_request_allowances=['jbordat-jb'],
-            user_push_restrictions=['jbordat-jb'],
+            users_bypass_pull_request_allowances=[BYPASS_USER],
+            user_push_restrictions=[BYPASS_USER],
         )
 
-        # TODO Ensure webhook
+    def gql(self, query, variables):
+        """
+        Run a GraphQL query / mutation
 
-        # To close connections after use
-        self.gh.close()
+        Args:
+            query (str): GraphQL document
+            variables (dict): query variables
+
+        Returns:
+            dict: response data
+        """
+        # Raises GithubException (UnknownObjectException on NOT_FOUND)
+        _, data = self.gh.requester.graphql_query(query, variables)
+        return data['data']
+
+    def gql_lookup(self):
+        """
+        Find repository, its protected branch rule and the bypass user
+
+        Returns:
+            tuple: (repository node, None if missing, bypass user node id)
+        """
+        try:
+            data = self.gql(GQL_LOOKUP, {
+                'org': self.github_org_name,
+                'repo': self.github_repo_name,
+                'ref': f"refs/heads/{PROTECTED_BRANCH}",
+                'user': BYPASS_USER,
+            })
+        except UnknownObjectException as e:
+            # Missing repository only: partial data still holds the user
+            errors = e.data.get('errors', [])
+            if [err.get('path') for err in errors] != [['organization', 'repository']]:  # noqa: E501
+                raise
+            data = e.data['data']
+        return data['organization']['repository'], data['user']['id']
 
     def create_repo(self, org):
         """
@@ -146,24 +237,22 @@ class GitLab:
         print("\t\ty")
         return repo
 
-    def get_repo(self, org, name: str):
+    def get_repo(self, org_name, name: str):
         """
         Find and return repository based on its name
 
         Args:
-            org (object): organization
+            org_name (str): organization name
             name (str): repository name
 
         Returns:
             object: repository
         """
         print(f"\tGet repo {name}")
-        repos = org.get_repos()
-        for repo in repos:
-            if repo.name == name:
-                return repo
-
-        return None
+        try:
+            return self.gh.get_repo(f"{org_name}/{name}")
+        except UnknownObjectException:
+            return None
 
     def get_org(self, org_name):
         """
@@ -179,7 +268,13 @@ class GitLab:
         return self.gh.get_organization(org_name)
 
 
-if __name__ == '__main__':
+def _build_parser():
+    """
+    Build the command line parser
+
+    Returns:
+        object: argument parser
+    """
     parser = argparse.ArgumentParser()
 
     # Local args
@@ -192,8 +287,20 @@ if __name__ == '__main__':
     parser.add_argument('--github-org')
     parser.add_argument('--github-create-repo',
                         action=argparse.BooleanOptionalAction)
+    return parser
+
+
+_PARSER = _build_parser()
+
 
-    args = parser.parse_args()
+def main(argv=None):
+    """
+    main entrypoint
+
+    Args:
+        argv (list): command line arguments (defaults to sys.argv)
+    """
+    args = _PARSER.parse_args(argv)
 
     glab = GitLab(
         # Local args
@@ -207,3 +314,7 @@ if __name__ == '__main__':
         gh_c_repo=args.github_create_repo,
     )
     glab.exec()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,10 @@ Gitlab repo creation
 
 import argparse
 import os
-import yaml
+from concurrent.futures import ThreadPoolExecutor
 import gitlab
+from common import resolve_conf, resolve_env
+from config_loader import load_config
 
 
 class GitLab:
@@ -20,29 +22,28 @@ class GitLab:
         self.config_file = cfg_f
         self.repo_path = repo_path
         # Read config (yaml) file
-        with open(self.repo_path + "/"+self.config_file, 'r', encoding="utf-8") as file:  # noqa: E501
-            config = yaml.safe_load(file)
+        config = load_config(os.path.join(self.repo_path, self.config_file))
         # Dry run
         self.dry_run = dr
         self.repo_local_name = config['repo_local_name']
 
         # GitLab vars
-        self.ci_server_url = self.set_var_env(gl_srv_url, 'CI_SERVER_URL')
-        server_token = self.set_var_env(gl_srv_tken, 'CI_SERVER_TOKEN')
-        self.gitlab_group = self.set_var_env(gl_group, 'GL_DEFAULT_GROUP')
-        self.gitlab_sync_repo_name = self.set_var_conf(
+        self.ci_server_url = resolve_env(gl_srv_url, 'CI_SERVER_URL')
+        server_token = resolve_env(gl_srv_tken, 'CI_SERVER_TOKEN')
+        self.gitlab_group = resolve_env(gl_group, 'GL_DEFAULT_GROUP')
+        self.gitlab_sync_repo_name = resolve_conf(
             config['repo_local_name'], 'gitlab_sync_repo_name', config)
-        self.gitlab_sync_repo_desc = self.set_var_conf(
+        self.gitlab_sync_repo_desc = resolve_conf(
             "", 'gitlab_sync_repo_desc', config)
-        self.gl_c_repo = self.set_var_conf(
+        self.gl_c_repo = resolve_conf(
             gl_c_repo, 'gitlab_create_repo', config)
-        self.gl_c_mirr = self.set_var_conf(
+        self.gl_c_mirr = resolve_conf(
             gl_c_mirr, 'gitlab_create_mirror', config)
 
         # GitHub vars
-        gh_user = self.set_var_env(gh_user, 'GITHUB_USER')
-        gh_pass = self.set_var_env(gh_pass, 'GITHUB_PASS')
-        org_name = self.set_var_env(gh_org, 'GITHUB_ORG')
+        gh_user = resolve_env(gh_user, 'GITHUB_USER')
+        gh_pass = resolve_env(gh_pass, 'GITHUB_PASS')
+        org_name = resolve_env(gh_org, 'GITHUB_ORG')
         self.github_repo_name = config['github_repo_name']
         # Github URLs
         domain = "github.com"
@@ -58,41 +59,10 @@ class GitLab:
         )
         # self.gl.enable_debug()
 
-        # Change execution location
-        os.chdir(self.repo_path)
-
-    def set_var_conf(self, var, key, config):
-        """
-        Facilitate config set up
-
-        Args:
-            var (str): input var
-            key (str): key in config
-            config (object): config key-values
-
-        Returns:
-            str: computed var to use
-        """
-        ret = var
-        if key in config:
-            ret = config[key]
-        return ret
-
-    def set_var_env(self, var, env):
-        """
-        Function to facilitate env vars
-
-        Args:
-            var (str): input value
-            env (str): env key to check
-
-        Returns:
-            str: computed env var to use
-        """
-        ret = var
-        if var is None:
-            ret = os.environ[env]
-        return ret
+        # Group id (only needed for repo creation)
+        self.group_id = None
+        if self.gl_c_repo:
+            self.group_id = self.gl.groups.list(search=self.gitlab_group, get_all=False)[0].id  # noqa: E501
 
     def exec(self):
         """ main function """
@@ -126,12 +96,18 @@ class GitLab:
             if repo is not None:
                 print("\tRepo already exists")
 
+        # Lookup mirror and protected branch concurrently (independent calls)
+        mirror = None
+        p_branch = None
+        if repo is not None:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                f_mirror = pool.submit(self.get_mirror, repo)
+                f_p_branch = pool.submit(self.get_protected_branch, repo)
+                mirror = f_mirror.result()
+                p_branch = f_p_branch.result()
+
         # Create mirror
         print('Mirror in:     '+self.repo_local_name)
-        if repo is not None:
-            mirror = self.get_mirror(repo)
-        else:
-            mirror = None
         if ((repo is not None and mirror is None) and self.gl_c_mirr) and not self.dry_run:  # noqa: E501
             mirror = self.create_mirror(repo)
         else:
@@ -144,9 +120,6 @@ class GitLab:
 
         # Update branch protection
         print(f"Branch protec: {self.repo_local_name}")
-        p_branch = None
-        if repo is not None:
-            p_branch = self.get_protected_branch(repo)
         if (repo is not None and p_branch is None) and not self.dry_run:  # noqa: E501
             p_branch = self.create_protected_branch(repo)
         else:
@@ -213,7 +186,8 @@ class GitLab:
             object: mirror
         """
         print(f"\tGet repo mirror {self.gh_r_url_mask}")
-        for mirror in repo.remote_mirrors.list(get_all=True):
+        # Lazy pagination: stop fetching pages on first match
+        for mirror in repo.remote_mirrors.list(iterator=True):
             if mirror.url == self.gh_r_url_mask:
                 return mirror
         return None
@@ -252,9 +226,8 @@ class GitLab:
             object: repository
         """
         print(f"\tCreate repo {group} / {repo}")
-        group_id = self.gl.groups.list(search=group, get_all=False)[0].id
         repo = self.gl.projects.create(
-            {'name': repo, 'namespace_id': group_id, 'description': desc})
+            {'name': repo, 'namespace_id': self.group_id, 'description': desc})
         print("\t\ty")
         return repo
 
@@ -269,14 +242,26 @@ class GitLab:
             obejct: repository
         """
         print(f"\tGet repo {name}")
-        for project in self.gl.projects.list(get_all=True):
+        try:
+            return self.gl.projects.get(f"{self.gitlab_group}/{name}")
+        except gitlab.exceptions.GitlabGetError:
+            pass
+
+        # Project name may differ from its path: server side search (1 page)
+        for project in self.gl.projects.list(search=name, search_namespaces=True, get_all=False):  # noqa E501
             if project.name == name and project.namespace['full_path'] == self.gitlab_group:  # noqa E501
                 return project
 
         return None
 
 
-if __name__ == '__main__':
+def _build_parser():
+    """
+    Build the command line parser
+
+    Returns:
+        object: argument parser
+    """
     parser = argparse.ArgumentParser()
 
     # Local args
@@ -295,8 +280,20 @@ if __name__ == '__main__':
     parser.add_argument('--github-user')
     parser.add_argument('--github-pass')
     parser.add_argument('--github-org')
+    return parser
+
+
+_PARSER = _build_parser()
+
 
-    args = parser.parse_args()
+def main(argv=None):
+    """
+    main entrypoint
+
+    Args:
+        argv (list): command line arguments (defaults to sys.argv)
+    """
+    args = _PARSER.parse_args(argv)
 
     glab = GitLab(
         # Local args
@@ -315,3 +312,7 @@ if __name__ == '__main__':
         gh_org=args.github_org,
     )
     glab.exec()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,36 @@ Markdown generation script script
 
 import argparse
 import os
-from jinja2 import Environment, FileSystemLoader
+import tempfile
+from functools import lru_cache
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
 DEFAULT_TYPE = "github"
 DEFAULT_INPUT = "template.md.j2"
 DEFAULT_OUTPUT = "Readme.md"
+BYTECODE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "jinja_cache")
+
+
+@lru_cache(maxsize=32)
+def _get_template(repo_path, intf):
+    """
+    Build (once per process) the Jinja2 environment and load the template
+
+    Args:
+        repo_path (str): templates location
+        intf (str): template file name
+
+    Returns:
+        object: compiled template
+    """
+    os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(repo_path),
+        cache_size=400,
+        auto_reload=False,
+        bytecode_cache=FileSystemBytecodeCache(BYTECODE_CACHE_DIR),
+    )
+    return env.get_template(intf)
 
 
 class MdBuilder:
@@ -34,9 +59,6 @@ class MdBuilder:
 
         self.dry_run = dr
 
-        # Change execution location
-        os.chdir(self.repo_path)
-
         # Summary
         print('---------------------------------------------------')
         print(f'Repo located:   {self.repo_path}')
@@ -48,27 +70,28 @@ class MdBuilder:
         print('')
         print('---------------------------------------------------')
 
-        # Create a Jinja2 environment
-        env = Environment(loader=FileSystemLoader(self.repo_path))
-
-        # Load the template
-        self.template = env.get_template(f'{self.intf}')
+        # Load the template (cached Jinja2 environment)
+        self.template = _get_template(self.repo_path, self.intf)
 
     def generate_markdown(self):
         """
         Function to generate the markdown file
         """
 
-        # Render the template with the appropriate context
+        # Render the template with the appropriate context, streamed
+        # straight to the output file
         context = {'repo_type': self.rtype}
-        rendered_content = self.template.render(context)
+        self.template.stream(context).dump(
+            os.path.join(self.repo_path, self.outf), encoding='utf-8')
 
-        # Write the rendered content to the output file
-        with open(self.outf, 'w', encoding='utf-8') as file:
-            file.write(rendered_content)
 
+def _build_parser():
+    """
+    Build the command line parser
 
-if __name__ == '__main__':
+    Returns:
+        object: argument parser
+    """
     parser = argparse.ArgumentParser()
 
     parser.add_argument('--repo-path')
@@ -76,8 +99,20 @@ if __name__ == '__main__':
     parser.add_argument('--output')
     parser.add_argument('--type')
     parser.add_argument('--dry-run', action=argparse.BooleanOptionalAction)
+    return parser
+
+
+_PARSER = _build_parser()
 
-    args = parser.parse_args()
+
+def main(argv=None):
+    """
+    main entrypoint
+
+    Args:
+        argv (list): command line arguments (defaults to sys.argv)
+    """
+    args = _PARSER.parse_args(argv)
 
     md = MdBuilder(
         repo_path=args.repo_path,
@@ -87,3 +122,7 @@ if __name__ == '__main__':
         dr=args.dry_run
     )
     md.generate_markdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,159 @@ Sends comments to GitLab merge requests via API
 
 import os
 import sys
+import json
+import time
 import argparse
-from typing import Optional
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MAX_DIFF_SIZE = 45000
+HARD_MAX_DIFF_FILE_SIZE = 10 * 1024 * 1024
+MR_IID_TTL = 300
+MR_IID_NONE_TTL = 10
+NOTES_TTL = 86400
+BATCH_WORKERS = 4
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "repo-ci")
+_MISSING = object()
+
+# Helm diff comment bodies, built once (str.format_map placeholders)
+_HELM_DIFF_EMPTY_TMPL = """## 🎯 Helm Chart Diff Results
+
+✅ **No differences found** between `main` and `{branch_name}` branches.
+
+The Helm chart templates are identical - no resources will be changed by this merge request."""
+
+_HELM_DIFF_TRUNCATED_TMPL = """{truncated_diff}
+
+... (diff truncated - total size: {diff_total_len} bytes)
+📎 **Full diff available in pipeline artifacts**"""
+
+_HELM_DIFF_TMPL = """## 🎯 Helm Chart Diff Results
+
+📊 **Changes detected** between `main` and `{branch_name}` branches:
+- **{added_lines}** lines added
+- **{removed_lines}** lines removed
+
+<details>
+<summary>📋 Click to view the diff</summary>
+
+```diff
+{diff_display}
+```
+
+</details>
+
+💡 **Review the changes above** to understand the impact on your Kubernetes resources.
+🔗 [View full pipeline logs]({pipeline_url}) | 📎 [Download diff artifact]({artifact_url})"""
+
+
+class ApiRetry(Retry):
+    """
+    Retry policy for the GitLab API: creating a note (POST) is not
+    idempotent, a 5xx may come after the note was saved, so POST is only
+    retried on connection errors and 429 (rejected before processing)
+    """
+
+    def is_retry(self, method: str, status_code: int,
+                 has_retry_after: bool = False) -> bool:
+        if method.upper() == 'POST':
+            return status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class MemoryCache:
+    """
+    Small TTL cache (key -> (value, expiry)), optionally persisted to a
+    json file so later runs in the same job container can reuse it
+    """
+
+    def __init__(self, max_size: int = 128, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self.entries = {}
+        # Shared by the --batch worker threads
+        self.lock = threading.Lock()
+        if self.path:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = {
+                        key: tuple(entry)
+                        for key, entry in json.load(f).items()
+                    }
+            except (OSError, ValueError, AttributeError, TypeError):
+                self.entries = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a cached value
+
+        Args:
+            key: cache key
+            default: returned when the key is missing or expired
+
+        Returns:
+            The cached value, default otherwise
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expiry = entry
+            if expiry < time.time():
+                del self.entries[key]
+                return default
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        Cache a value
+
+        Args:
+            key: cache key
+            value: value to cache (json serializable)
+            ttl: time to live in seconds
+        """
+        with self.lock:
+            now = time.time()
+            self.entries = {
+                k: e for k, e in self.entries.items() if e[1] >= now
+            }
+            self.entries[key] = (value, now + ttl)
+            while len(self.entries) > self.max_size:
+                del self.entries[next(iter(self.entries))]
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with open(self.path, 'w', encoding='utf-8') as f:
+                        json.dump(self.entries, f)
+                except OSError:
+                    pass
+
+
+def _ci_cache_path(name: str) -> Optional[str]:
+    """
+    Location of a cache file, kept out of the checked out repository
+
+    Args:
+        name: cache file name
+
+    Returns:
+        str: path under the temp dir, None outside of CI
+    """
+    if not os.environ.get('CI_PROJECT_DIR'):
+        return None
+    return os.path.join(CACHE_DIR, name)
+
+
+mr_iid_cache = MemoryCache(path=_ci_cache_path('mriid-cache.json'))
+# MR notes first page: ETag, next page url and
+# (note id, body first line) index
+notes_cache = MemoryCache(path=_ci_cache_path('mr-notes-cache.json'))
 
 
 class GitLabMRCommenter:
@@ -16,35 +166,69 @@ class GitLabMRCommenter:
     Class responsible to create a comment in MRs
     """
 
+    # Environment variables to try, in order, for api_url, project_id,
+    # ci_commit_ref_name and token
+    _REQUIRED = (
+        ('GITLAB_API_URL', 'CI_API_V4_URL'),
+        ('CI_PROJECT_ID',),
+        ('CI_COMMIT_REF_NAME',),
+        ('RENOVATE_TOKEN',),
+    )
+
     def __init__(self):
-        self.api_url = os.environ.get(
-            'GITLAB_API_URL',
-            os.environ.get('CI_API_V4_URL')
-        )
-        self.project_id = os.environ.get('CI_PROJECT_ID')
-        self.ci_commit_ref_name = os.environ.get('CI_COMMIT_REF_NAME')
-        self.token = os.environ.get('RENOVATE_TOKEN')
         self.mr_iid = None  # Will be fetched dynamically
 
-        required_vars = [
-            self.api_url, self.project_id,
-            self.ci_commit_ref_name, self.token
-        ]
-
-        if not all(required_vars):
-            missing = []
-            if not self.api_url:
-                missing.append('GITLAB_API_URL or CI_API_V4_URL')
-            if not self.project_id:
-                missing.append('CI_PROJECT_ID')
-            if not self.ci_commit_ref_name:
-                missing.append('CI_COMMIT_REF_NAME')
-            if not self.token:
-                missing.append('RENOVATE_TOKEN')
-
+        # Single pass: collect values and missing variables
+        env = os.environ
+        values = []
+        missing = []
+        for names in self._REQUIRED:
+            value = next((env[n] for n in names if env.get(n)), None)
+            values.append(value)
+            if value is None:
+                missing.append(' or '.join(names))
+        (self.api_url, self.project_id,
+         self.ci_commit_ref_name, self.token) = values
+
+        if missing:
             error_msg = f"Missing required environment variables: {', '.join(missing)}" # noqa E501
             raise ValueError(error_msg)
 
+        # Pooled session: keep-alive across all API calls
+        self.session = requests.Session()
+        self.session.headers.update({
+            'PRIVATE-TOKEN': self.token,
+            'Content-Type': 'application/json'
+        })
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            # Exponential backoff on transient errors, honoring the
+            # Retry-After header GitLab sends with 429 (rate limit)
+            max_retries=ApiRetry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'PUT']),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release pooled connections
+        """
+        self.session.close()
+
     def _get_mr_iid(self) -> Optional[int]:
         """
         Find the MR IID for the current branch by querying GitLab API
@@ -55,6 +239,12 @@ class GitLabMRCommenter:
         if self.mr_iid is not None:
             return self.mr_iid
 
+        cache_key = f"mriid:{self.project_id}:{self.ci_commit_ref_name}"
+        cached = mr_iid_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            self.mr_iid = cached
+            return cached
+
         url = f"{self.api_url}/projects/{self.project_id}/merge_requests"
         params = {
             'scope': 'all',
@@ -62,15 +252,8 @@ class GitLabMRCommenter:
             'source_branch': self.ci_commit_ref_name
         }
 
-        headers = {
-            'PRIVATE-TOKEN': self.token,
-            'Content-Type': 'application/json'
-        }
-
         try:
-            response = requests.get(
-                url, headers=headers, params=params, timeout=30
-            )
+            response = self.session.get(url, params=params, timeout=30)
             response.raise_for_status()
 
             merge_requests = response.json()
@@ -81,6 +264,7 @@ class GitLabMRCommenter:
                     f"'{self.ci_commit_ref_name}'"
                 )
                 print(warning_msg, file=sys.stderr)
+                mr_iid_cache.set(cache_key, None, MR_IID_NONE_TTL)
                 return None
 
             if len(merge_requests) > 1:
@@ -92,6 +276,7 @@ class GitLabMRCommenter:
 
             mr_iid = merge_requests[0]['iid']
             self.mr_iid = mr_iid  # Cache the result
+            mr_iid_cache.set(cache_key, mr_iid, MR_IID_TTL)
             success_msg = (
                 f"📝 Found merge request !{mr_iid} for branch "
                 f"'{self.ci_commit_ref_name}'"
@@ -124,24 +309,21 @@ class GitLabMRCommenter:
             )
             return False
 
+        return self._post_comment_for(mr_iid, comment)
+
+    def _post_comment_for(self, mr_iid: int, comment: str) -> bool:
+        """Post a comment to a known merge request"""
         url = (
             f"{self.api_url}/projects/{self.project_id}/"
             f"merge_requests/{mr_iid}/notes"
         )
 
-        headers = {
-            'PRIVATE-TOKEN': self.token,
-            'Content-Type': 'application/json'
-        }
-
         data = {
             'body': comment
         }
 
         try:
-            response = requests.post(
-                url, headers=headers, json=data, timeout=30
-            )
+            response = self.session.post(url, json=data, timeout=30)
             response.raise_for_status()
 
             print(f"✅ Comment posted successfully to MR !{mr_iid}")
@@ -164,72 +346,198 @@ class GitLabMRCommenter:
         Returns:
             bool: True if successful, False otherwise
         """
+        # Resolve the MR once for the whole flow
+        mr_iid = self._get_mr_iid()
+        if mr_iid is None:
+            print(
+                "❌ Cannot post comment: No merge request found",
+                file=sys.stderr
+            )
+            return False
+
         # Add identifier to comment
         comment_with_id = f"<!-- {identifier} -->\n{comment}"
 
         # Try to find existing comment
-        existing_note_id = self._find_existing_note(identifier)
+        existing_note_id = self._find_existing_note_for(mr_iid, identifier)
 
         if existing_note_id:
-            return self._update_note(existing_note_id, comment_with_id)
+            return self._update_note_for(
+                mr_iid, identifier, existing_note_id, comment_with_id
+            )
         else:
-            return self.post_comment(comment_with_id)
+            return self._post_comment_for(mr_iid, comment_with_id)
 
-    def _find_existing_note(self, identifier: str) -> Optional[int]:
-        """Find existing note with identifier"""
+    def post_batch(self, pairs: List[Tuple[str, str]]) -> bool:
+        """
+        Update or create several identified comments at once
+
+        Args:
+            pairs: (identifier, comment) tuples
+
+        Returns:
+            bool: True if all successful, False otherwise
+        """
+        if not pairs:
+            return True
+
+        # One request per identifier: duplicates would race in the pool
+        identifiers = []
+        seen = set()
+        for identifier, _ in pairs:
+            if identifier in seen:
+                raise ValueError(f"Duplicate batch identifier: {identifier}")
+            seen.add(identifier)
+            identifiers.append(identifier)
+
+        # Resolve the MR and list its notes once for all comments
         mr_iid = self._get_mr_iid()
         if mr_iid is None:
-            return None
+            print(
+                "❌ Cannot post comment: No merge request found",
+                file=sys.stderr
+            )
+            return False
+        existing = self._find_existing_notes_for(mr_iid, identifiers)
+
+        def send(pair: Tuple[str, str]) -> bool:
+            identifier, comment = pair
+            comment_with_id = f"<!-- {identifier} -->\n{comment}"
+            if identifier in existing:
+                return self._update_note_for(
+                    mr_iid, identifier, existing[identifier], comment_with_id
+                )
+            return self._post_comment_for(mr_iid, comment_with_id)
+
+        # Session is shared: PUT / POST run concurrently on pooled connections
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            return all(list(pool.map(send, pairs)))
 
+    def _find_existing_note_for(
+        self, mr_iid: int, identifier: str
+    ) -> Optional[int]:
+        """Find existing note with identifier"""
+        return self._find_existing_notes_for(
+            mr_iid, [identifier]
+        ).get(identifier)
+
+    def _find_existing_notes_for(
+        self, mr_iid: int, identifiers: List[str]
+    ) -> Dict[str, int]:
+        """Find existing notes for several identifiers in one listing"""
         url = (
             f"{self.api_url}/projects/{self.project_id}/"
             f"merge_requests/{mr_iid}/notes"
         )
 
-        headers = {
-            'PRIVATE-TOKEN': self.token,
-            'Content-Type': 'application/json'
+        # The marker is always the first line of the comments we create
+        pending = {
+            f"<!-- {identifier} -->": identifier for identifier in identifiers
         }
+        found = {}
 
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+        # Newest first: identifier comments are usually recently touched
+        params = {
+            'per_page': 100,
+            'order_by': 'updated_at',
+            'sort': 'desc'
+        }
 
-            notes = response.json()
-            for note in notes:
-                if f"<!-- {identifier} -->" in note.get('body', ''):
-                    return note['id']
+        # Conditional request: 304 when notes did not change since last run
+        cache_key = f"notes-v4:{self.project_id}:{mr_iid}"
+        cached = notes_cache.get(cache_key)
+        headers = {'If-None-Match': cached['etag']} if cached else {}
 
-            return None
+        try:
+            response = self.session.get(
+                url, params=params, headers=headers, timeout=30
+            )
+            if response.status_code == 304:
+                self._match_notes(cached['notes'], pending, found)
+                # First page unchanged: resume from the second one if needed
+                if not pending or not cached.get('next'):
+                    return found
+                response = self.session.get(cached['next'], timeout=30)
+            else:
+                response.raise_for_status()
+                if response.headers.get('ETag'):
+                    notes_cache.set(cache_key, {
+                        'etag': response.headers['ETag'],
+                        'next': response.links.get('next', {}).get('url'),
+                        'notes': [
+                            # Marker line in full, whatever its length
+                            (
+                                note['id'],
+                                (note.get('body') or '').split('\n', 1)[0]
+                            )
+                            for note in response.json()
+                        ]
+                    }, NOTES_TTL)
+
+            while True:
+                response.raise_for_status()
+
+                self._match_notes(
+                    (
+                        (note['id'], note.get('body'))
+                        for note in response.json()
+                    ),
+                    pending, found
+                )
+
+                # Follow pagination only when not all found yet
+                next_page = response.links.get('next')
+                if not pending or not next_page:
+                    return found
+                response = self.session.get(next_page['url'], timeout=30)
 
         except requests.exceptions.RequestException as e:
             print(f"⚠️ Failed to fetch existing notes: {e}", file=sys.stderr)
-            return None
-
-    def _update_note(self, note_id: int, comment: str) -> bool:
-        """Update existing note"""
-        mr_iid = self._get_mr_iid()
-        if mr_iid is None:
-            return False
+            return found
+
+    @staticmethod
+    def _match_notes(notes, pending: Dict[str, str], found: Dict[str, int]):
+        """Move identifiers whose marker starts a note body to found"""
+        for note_id, body in notes:
+            if not body:
+                continue
+            for marker in [m for m in pending if body.startswith(m)]:
+                found[pending.pop(marker)] = note_id
+
+    def _update_note_for(
+        self, mr_iid: int, identifier: str, note_id: int, comment: str,
+        retry: bool = True
+    ) -> bool:
+        """
+        Update existing note (single PUT)
 
+        GitLab has no precondition on note updates: two pipelines updating
+        the same note concurrently is last writer wins. Only a note deleted
+        since it was listed is handled, by looking it up again once.
+        """
         url = (
             f"{self.api_url}/projects/{self.project_id}/"
             f"merge_requests/{mr_iid}/notes/{note_id}"
         )
 
-        headers = {
-            'PRIVATE-TOKEN': self.token,
-            'Content-Type': 'application/json'
-        }
-
         data = {
             'body': comment
         }
 
         try:
-            response = requests.put(
-                url, headers=headers, json=data, timeout=30
-            )
+            response = self.session.put(url, json=data, timeout=30)
+            if response.status_code == 404 and retry:
+                print(
+                    f"⚠️ Comment gone from MR !{mr_iid}, "
+                    "looking it up again",
+                    file=sys.stderr
+                )
+                current = self._find_existing_note_for(mr_iid, identifier)
+                if current is None:
+                    return self._post_comment_for(mr_iid, comment)
+                return self._update_note_for(
+                    mr_iid, identifier, current, comment, retry=False
+                )
             response.raise_for_status()
 
             print(f"✅ Comment updated successfully in MR !{mr_iid}")
@@ -247,46 +555,83 @@ def create_helm_diff_comment(
     branch_name: str,
     pipeline_url: str,
     job_id: str,
-    max_diff_size: int = 45000
+    max_diff_size: int = MAX_DIFF_SIZE,
+    diff_total_len: Optional[int] = None
 ) -> str:
-    """Create formatted helm diff comment"""
+    """
+    Create formatted helm diff comment
 
-    if added_lines == 0 and removed_lines == 0:
-        return f"""## 🎯 Helm Chart Diff Results
+    Args:
+        diff_content: diff text, may already be cut to max_diff_size + 1
+        diff_total_len: full diff size in bytes (defaults to len(diff_content))
+    """
 
-✅ **No differences found** between `main` and `{branch_name}` branches.
+    if added_lines == 0 and removed_lines == 0:
+        return _HELM_DIFF_EMPTY_TMPL.format_map({'branch_name': branch_name})
 
-The Helm chart templates are identical - no resources will be changed by this merge request."""
+    if diff_total_len is None:
+        diff_total_len = len(diff_content)
 
     # Truncate diff if too large
     if len(diff_content) > max_diff_size:
-        truncated_diff = diff_content[:max_diff_size]
-        diff_display = f"""{truncated_diff}
-
-... (diff truncated - total size: {len(diff_content)} characters)
-📎 **Full diff available in pipeline artifacts**"""
+        diff_display = _HELM_DIFF_TRUNCATED_TMPL.format_map({
+            'truncated_diff': diff_content[:max_diff_size],
+            'diff_total_len': diff_total_len,
+        })
     else:
         diff_display = diff_content
 
     artifact_url = f"{pipeline_url}/-/jobs/{job_id}/artifacts/download"
 
-    return f"""## 🎯 Helm Chart Diff Results
+    return _HELM_DIFF_TMPL.format_map({
+        'branch_name': branch_name,
+        'added_lines': added_lines,
+        'removed_lines': removed_lines,
+        'diff_display': diff_display,
+        'pipeline_url': pipeline_url,
+        'artifact_url': artifact_url,
+    })
 
-📊 **Changes detected** between `main` and `{branch_name}` branches:
-- **{added_lines}** lines added
-- **{removed_lines}** lines removed
 
-<details>
-<summary>📋 Click to view the diff</summary>
+def read_batch(path: str) -> List[Tuple[str, str]]:
+    """
+    Read batch records (one JSON object per line)
 
-```diff
-{diff_display}
-```
+    Args:
+        path: JSONL file with identifier and comment (or file) keys
 
-</details>
+    Returns:
+        list: (identifier, comment) tuples
 
-💡 **Review the changes above** to understand the impact on your Kubernetes resources.
-🔗 [View full pipeline logs]({pipeline_url}) | 📎 [Download diff artifact]({artifact_url})"""
+    Raises:
+        ValueError: malformed or incomplete record
+    """
+    pairs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            where = f"{path}:{lineno}"
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(
+                    f"Batch record {where} is not valid JSON: {e}"
+                ) from e
+            if not isinstance(record, dict) or not record.get('identifier'):
+                raise ValueError(f"Batch record {where} has no identifier")
+            identifier = record['identifier']
+            comment = record.get('comment')
+            if comment is None:
+                if 'file' not in record:
+                    raise ValueError(
+                        f"Batch record {where} ('{identifier}') "
+                        "needs a comment or a file key"
+                    )
+                with open(record['file'], 'r', encoding='utf-8') as cf:
+                    comment = cf.read()
+            pairs.append((identifier, comment))
+    return pairs
 
 
 def main():
@@ -330,6 +675,12 @@ def main():
         '--diff-file',
         help='File containing diff content (for helm diff)'
     )
+    parser.add_argument(
+        '--max-diff-file-size',
+        type=int,
+        default=HARD_MAX_DIFF_FILE_SIZE,
+        help='Diff files above this size (bytes) are not read at all'
+    )
     parser.add_argument(
         '--branch-name',
         help='Branch name (defaults to CI_COMMIT_REF_NAME)'
@@ -342,53 +693,75 @@ def main():
         '--job-id',
         help='Job ID (defaults to CI_JOB_ID)'
     )
+    parser.add_argument(
+        '--batch',
+        help='JSONL file of {"identifier", "comment" or "file"} records'
+    )
 
     args = parser.parse_args()
 
     try:
-        commenter = GitLabMRCommenter()
-
-        if args.helm_diff:
-            # Create helm diff comment
-            branch_name = (
-                args.branch_name or
-                os.environ.get('CI_COMMIT_REF_NAME', 'unknown')
-            )
-            pipeline_url = (
-                args.pipeline_url or
-                os.environ.get('CI_PIPELINE_URL', '')
-            )
-            job_id = args.job_id or os.environ.get('CI_JOB_ID', '')
-
-            diff_content = ""
-            if args.diff_file and os.path.exists(args.diff_file):
-                with open(args.diff_file, 'r') as f:
-                    diff_content = f.read()
-
-            comment = create_helm_diff_comment(
-                args.added_lines, args.removed_lines, diff_content,
-                branch_name, pipeline_url, job_id
-            )
-
-            identifier = args.identifier or "helm-chart-diff"
-            success = commenter.update_or_create_comment(comment, identifier)
-
-        else:
-            # Regular comment
-            if args.file:
-                with open(args.file, 'r') as f:
-                    comment = f.read()
-            elif args.comment:
-                comment = args.comment
-            else:
-                comment = sys.stdin.read()
+        with GitLabMRCommenter() as commenter:
+            if args.batch:
+                # Several identified comments in one run
+                success = commenter.post_batch(read_batch(args.batch))
+
+            elif args.helm_diff:
+                # Create helm diff comment
+                branch_name = (
+                    args.branch_name or
+                    os.environ.get('CI_COMMIT_REF_NAME', 'unknown')
+                )
+                pipeline_url = (
+                    args.pipeline_url or
+                    os.environ.get('CI_PIPELINE_URL', '')
+                )
+                job_id = args.job_id or os.environ.get('CI_JOB_ID', '')
+
+                # Read only what can be displayed (+1 to detect truncation)
+                diff_content = ""
+                diff_total_len = 0
+                if args.diff_file and os.path.exists(args.diff_file):
+                    diff_total_len = os.path.getsize(args.diff_file)
+                    if diff_total_len > args.max_diff_file_size:
+                        diff_content = (
+                            f"(diff too large - {diff_total_len} bytes, "
+                            "see pipeline artifacts)"
+                        )
+                    else:
+                        with open(
+                            args.diff_file, 'r',
+                            encoding='utf-8', errors='replace'
+                        ) as f:
+                            diff_content = f.read(MAX_DIFF_SIZE + 1)
+
+                comment = create_helm_diff_comment(
+                    args.added_lines, args.removed_lines, diff_content,
+                    branch_name, pipeline_url, job_id,
+                    diff_total_len=diff_total_len
+                )
 
-            if args.identifier:
+                identifier = args.identifier or "helm-chart-diff"
                 success = commenter.update_or_create_comment(
-                    comment, args.identifier
+                    comment, identifier
                 )
+
             else:
-                success = commenter.post_comment(comment)
+                # Regular comment
+                if args.file:
+                    with open(args.file, 'r') as f:
+                        comment = f.read()
+                elif args.comment:
+                    comment = args.comment
+                else:
+                    comment = sys.stdin.read()
+
+                if args.identifier:
+                    success = commenter.update_or_create_comment(
+                        comment, args.identifier
+                    )
+                else:
+                    success = commenter.post_comment(comment)
 
         sys.exit(0 if success else 1)
 
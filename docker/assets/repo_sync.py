@@ -9,9 +9,8 @@ Repository sync script
 import argparse
 import subprocess
 import os
-import time
 from urllib.parse import urlparse
-import yaml
+from common import resolve_conf, resolve_env
 
 
 class GitLab:
@@ -21,140 +20,115 @@ class GitLab:
         # Local vars
         self.config_file = cfg_f
         self.repo_path = repo_path
-        # Read config (yaml) file
-        with open(self.repo_path + "/"+cfg_f, 'r', encoding="utf-8") as file:  # noqa: E501
-            config = yaml.safe_load(file)
-        os.remove(self.repo_path + "/"+cfg_f)
+        # Read config (yaml) file, yaml only imported on actual run
+        from config_loader import load_config  # pylint: disable=import-outside-toplevel # noqa: E501
+        config = load_config(os.path.join(self.repo_path, cfg_f))
+        os.remove(os.path.join(self.repo_path, cfg_f))
         # Dry run
         self.dry_run = dr
         self.repo_local_name = config['repo_local_name']
 
         # GitLab vars
-        self.ci_server_url = self.set_var_env(gl_srv_url, 'CI_SERVER_URL')
-        server_token = self.set_var_env(gl_srv_tken, 'CI_SERVER_TOKEN')
-        self.gitlab_group = self.set_var_env(gl_group, 'GL_DEFAULT_GROUP')
-        self.gitlab_user_name = self.set_var_env(gl_uname, 'GL_USER_NAME')
-        self.gitlab_user_mail = self.set_var_env(gl_umail, 'GL_USER_MAIL')
-        self.gitlab_sync_repo_name = self.set_var_conf(
+        self.ci_server_url = resolve_env(gl_srv_url, 'CI_SERVER_URL')
+        server_token = resolve_env(gl_srv_tken, 'CI_SERVER_TOKEN')
+        self.gitlab_group = resolve_env(gl_group, 'GL_DEFAULT_GROUP')
+        self.gitlab_user_name = resolve_env(gl_uname, 'GL_USER_NAME')
+        self.gitlab_user_mail = resolve_env(gl_umail, 'GL_USER_MAIL')
+        self.gitlab_sync_repo_name = resolve_conf(
             config['repo_local_name'], 'gitlab_sync_repo_name', config)
         # GitLab Url
         o = urlparse(self.ci_server_url)
-        self.gl_url = f"{o.scheme}://oauth2:{server_token}@{o.netloc}/{self.gitlab_group}/{self.gitlab_sync_repo_name}.git"  # noqa E501
-        self.gl_url_mask = f"{o.scheme}://oauth2:******@{o.netloc}/{self.gitlab_group}/{self.gitlab_sync_repo_name}.git"  # noqa E501
-        self.gl_ori_url = f"{o.scheme}://oauth2:{server_token}@{o.netloc}/{os.environ['CI_PROJECT_PATH']}"  # noqa E501
-
-        # Change execution location
-        os.chdir(self.repo_path)
-        self.pwd = os.getcwd()
-
-    def set_var_conf(self, var, key, config):
-        """
-        Facilitate config set up
-
-        Args:
-            var (str): input var
-            key (str): key in config
-            config (object): config key-values
-
-        Returns:
-            str: computed var to use
-        """
-        ret = var
-        if key in config:
-            ret = config[key]
-        return ret
-
-    def set_var_env(self, var, env):
-        """
-        Function to facilitate env vars
-
-        Args:
-            var (str): input value
-            env (str): env key to check
-
-        Returns:
-            str: computed env var to use
-        """
-        ret = var
-        if var is None:
-            ret = os.environ[env]
-        return ret
+        base = f"{o.scheme}://oauth2:"
+        host = f"@{o.netloc}/"
+        repo = f"{self.gitlab_group}/{self.gitlab_sync_repo_name}.git"
+        self.gl_url = base + server_token + host + repo
+        self.gl_url_mask = base + "******" + host + repo
+        self.gl_ori_url = base + server_token + host + os.environ['CI_PROJECT_PATH']  # noqa E501
+
+        self.pwd = os.path.abspath(self.repo_path)
+        # Per-invocation git config (safe path + user), carried by every
+        # git command instead of separate `git config` processes
+        self.git_opts = (
+            '-c', f'safe.directory={self.pwd}',
+            '-c', f'user.email={self.gitlab_user_mail}',
+            '-c', f'user.name={self.gitlab_user_name}',
+        )
 
     def exec(self):
         """ main function """
 
         # Summary
-        print('---------------------------------------------------')
-        print('Gitlab repo:    '+self.repo_local_name)
-        print('GitLab group:   '+self.gitlab_group)
-        print('Git url:        '+self.gl_url_mask)
-        print('')
-        print('Repo located:   '+self.pwd)
-        print('Config file:    '+self.config_file)
-        print('Running from:   '+os.path.abspath(__file__))
-        print('')
-        print('Server host:    '+self.ci_server_url)
-        print('---------------------------------------------------')
+        sep = '-' * 51
+        banner = (
+            f"{sep}\n"
+            f"Gitlab repo:    {self.repo_local_name}\n"
+            f"GitLab group:   {self.gitlab_group}\n"
+            f"Git url:        {self.gl_url_mask}\n"
+            "\n"
+            f"Repo located:   {self.pwd}\n"
+            f"Config file:    {self.config_file}\n"
+            f"Running from:   {os.path.abspath(__file__)}\n"
+            "\n"
+            f"Server host:    {self.ci_server_url}\n"
+            f"{sep}"
+        )
+        print(banner, flush=True)
 
         print('Repository:    '+self.repo_local_name)
 
-        # Set path safe
-        # git config --global --add safe.directory $(pwd)
-        print('\tSafe space')
-        subprocess.Popen(['git', 'config',
-                          '--global', '--add',
-                          'safe.directory', self.pwd])
-        time.sleep(5)
-
         # git status
         print('\tstatus')
-        subprocess.Popen(['git', 'status'])
-        time.sleep(5)
-
-        # Set user
-        print('\tset user')
-        # git config user.email $GL_USER_MAIL
-        subprocess.Popen([
-            'git', 'config', 'user.email',
-            self.gitlab_user_mail
-        ])
-        # git config user.name $GL_USER_NAME
-        subprocess.Popen([
-            'git', 'config', 'user.name',
-            self.gitlab_user_name
-        ])
-        time.sleep(5)
+        self._git('status')
 
         # GIt commit
         print('\tcommit')
         # git add .
-        subprocess.Popen(['git', 'add', '.'])
-        time.sleep(5)
-        # git commit -m 'synced by ci bot'
-        subprocess.Popen(['git', 'commit', '-m', 'synced by ci bot'])
-        time.sleep(5)
-
-        # Git fetch
-        # git fetch --unshallow https://oauth2:$CI_SERVER_TOKEN@$CI_SERVER_HOST/$CI_PROJECT_PATH # noqa E501
-        subprocess.Popen(["git", "fetch", "--unshallow", self.gl_ori_url])
-        time.sleep(5)
-        # git init
-        subprocess.Popen(["git", "init"])
-        time.sleep(5)
+        self._git('add', '.')
+        # git commit -m 'synced by ci bot' (nothing to commit is fine)
+        self._git('commit', '-m', 'synced by ci bot', check=False)
+
         # Change remote
         print('\tremote add')
-        subprocess.Popen(['git', 'remote',
-                          'add', 'origin_gl',
-                          self.gl_url])
-        time.sleep(5)
+        # Reused CI workspace: the remote may be left from a previous job
+        self._git('remote', 'remove', 'origin_gl', check=False)
+        self._git('remote', 'add', 'origin_gl', self.gl_url)
         # git push origin master
+        # Push the shallow HEAD first: the destination usually has the
+        # history already. Unshallow only when the push gets rejected.
         print('\tpush')
-        subprocess.Popen(
-            ["git", "push", "--force", "origin_gl", f"HEAD:refs/heads/{os.environ['CI_COMMIT_BRANCH']}"])  # noqa E501
-        time.sleep(5)
+        ref = f"HEAD:refs/heads/{os.environ['CI_COMMIT_BRANCH']}"
+        push = self._git('push', '--force', 'origin_gl', ref, check=False)
+        if push is not None and push.returncode != 0:
+            # git fetch --unshallow https://oauth2:$CI_SERVER_TOKEN@$CI_SERVER_HOST/$CI_PROJECT_PATH # noqa E501
+            print('\tpush rejected, fetching full history')
+            self._git('fetch', '--unshallow', self.gl_ori_url, check=False)
+            self._git('push', '--force', 'origin_gl', ref)
+
+    def _git(self, *args, check=True):
+        """
+        Run a git command in the repo and wait for it to finish
 
+        Args:
+            args (str): git arguments
+            check (bool): raise on non-zero exit code
 
-if __name__ == '__main__':
+        Returns:
+            obj: completed process (None on dry-run)
+        """
+        if self.dry_run:
+            print(f"\t\tdry-run: git {args[0]}")
+            return None
+        return subprocess.run(('git',) + self.git_opts + args,
+                              cwd=self.pwd, check=check)
+
+
+def _build_parser():
+    """
+    Build the command line parser
+
+    Returns:
+        object: argument parser
+    """
     parser = argparse.ArgumentParser()
 
     # Local args
@@ -167,8 +141,20 @@ if __name__ == '__main__':
     parser.add_argument('--gitlab-group')
     parser.add_argument('--gitlab-user-name')
     parser.add_argument('--gitlab-user-mail')
+    return parser
+
+
+_PARSER = _build_parser()
+
 
-    args = parser.parse_args()
+def main(argv=None):
+    """
+    main entrypoint
+
+    Args:
+        argv (list): command line arguments (defaults to sys.argv)
+    """
+    args = _PARSER.parse_args(argv)
 
     glab = GitLab(
         # Local args
@@ -183,3 +169,7 @@ if __name__ == '__main__':
         gl_umail=args.gitlab_user_mail,
     )
     glab.exec()
+
+
+if __name__ == '__main__':
+    main()